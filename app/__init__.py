@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import logging
+from flask import Flask
+from config import Config
+from app.models.filter_model import FilterModel
+from app.models.prompt_model import PromptModel
+from app.models.debate_model import DebateModel
+from app.models.moderator_model import ModeratorModel
+from app.models._ollama_client import OllamaClient
+from app.models._http import EXECUTOR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _preload(client, model):
+    """Load a model into Ollama in the background, warning if it fails."""
+    try:
+        client.preload(model)
+        logger.info("Preloaded Ollama model %s", model)
+    except Exception as e:
+        logger.warning("Could not preload Ollama model %s: %s", model, e)
+
+
+def create_app(config_class=Config):
+    """
+    Create the Flask application.
+
+    The model wrappers are built once here and shared by every request,
+    so per-instance state such as the topic cache lives for the process.
+    They all talk to Ollama through one client and its connection pool.
+
+    Args:
+        config_class: Configuration object to load settings from
+
+    Returns:
+        Flask: The configured application
+    """
+    # No-op if the embedding server has already configured logging
+    logging.basicConfig(level=logging.INFO)
+
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    client = OllamaClient(max_parallel=app.config['OLLAMA_NUM_PARALLEL'])
+    app.extensions['ollama_client'] = client
+    # The models fan out on this same pool, so routes share it too
+    app.extensions['executor'] = EXECUTOR
+    # The stance is passed per call, so both sides share one debater
+    debate_model = DebateModel(app.config['DEBATE_MODEL'], client)
+    app.extensions['debate_models'] = SimpleNamespace(
+        filter=FilterModel(app.config['FILTER_MODEL'], client),
+        prompt=PromptModel(app.config['PROMPT_MODEL'], client),
+        debate_for=debate_model,
+        debate_against=debate_model,
+        moderator=ModeratorModel(app.config['MODERATOR_MODEL'], client)
+    )
+
+    if app.config['PRELOAD_MODELS']:
+        model_names = {
+            app.config[key]
+            for key in ('FILTER_MODEL', 'PROMPT_MODEL', 'DEBATE_MODEL', 'MODERATOR_MODEL')
+        }
+        for model_name in sorted(model_names):
+            EXECUTOR.submit(_preload, client, model_name)
+
+    from app.routes import main
+    app.register_blueprint(main)
+
+    return app
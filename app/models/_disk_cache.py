@@ -0,0 +1,75 @@
+from typing import Optional
+import logging
+import os
+import sqlite3
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Persistent key/value store for LLM outputs that are pure functions of
+# their inputs, so repeat debate setups survive restarts. Point the path
+# somewhere writable on read-only deploys.
+_DB_PATH = os.getenv(
+    "DEBATE_PROMPT_CACHE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".prompt_cache.sqlite3"
+    )
+)
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _open(path: str) -> sqlite3.Connection:
+    """Open the cache database at path, creating its table if needed."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v TEXT)")
+    conn.commit()
+    return conn
+
+
+def _connection() -> sqlite3.Connection:
+    """Connect on first use, keeping the cache in memory if the file can't be used."""
+    global _conn
+    if _conn is None:
+        try:
+            _conn = _open(_DB_PATH)
+        except sqlite3.Error as e:
+            logger.warning("Prompt cache %s unavailable (%s); caching in memory only", _DB_PATH, e)
+            _conn = _open(":memory:")
+    return _conn
+
+
+def get(key: str) -> Optional[str]:
+    """
+    Fetch a cached value.
+
+    Args:
+        key (str): Cache key
+
+    Returns:
+        Optional[str]: The stored value, or None if absent
+    """
+    with _lock:
+        row = _connection().execute("SELECT v FROM cache WHERE k = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def put(key: str, value: str) -> None:
+    """
+    Store a value, replacing any existing entry for the key.
+
+    Args:
+        key (str): Cache key
+        value (str): Value to store
+    """
+    with _lock:
+        conn = _connection()
+        try:
+            conn.execute("INSERT OR REPLACE INTO cache (k, v) VALUES (?, ?)", (key, value))
+            conn.commit()
+        except sqlite3.Error as e:
+            # A full or read-only disk only costs the cache entry
+            logger.warning("Could not write prompt cache entry: %s", e)
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+import requests
+from requests.adapters import HTTPAdapter
+
+# Worker threads for overlapping independent Ollama calls. Request threads
+# make calls of their own, and OllamaClient's generation slots, not this
+# worker count, bound how many calls reach Ollama at once.
+EXECUTOR_WORKERS = 8
+EXECUTOR = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="ollama")
+
+
+def make_session(max_connections: int) -> requests.Session:
+    """
+    Build a keep-alive session whose pool holds max_connections connections.
+
+    Every call goes to the same Ollama host, so one host pool is enough.
+    pool_block makes the size a hard limit: extra callers wait for a pooled
+    connection instead of opening one that is thrown away afterwards.
+
+    Args:
+        max_connections (int): Most connections open to Ollama at once
+
+    Returns:
+        requests.Session: The pooled session
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max_connections,
+        pool_block=True
+    ))
+    return session
+
+
+def run_concurrently(*calls: Callable[[], Any]) -> List[Any]:
+    """
+    Run independent zero-argument callables on the shared executor.
+
+    Args:
+        *calls: Callables to run, typically lambdas wrapping model methods
+
+    Returns:
+        List[Any]: Results in the same order as the calls
+
+    Raises:
+        Exception: The first exception raised by any of the calls
+    """
+    futures = [EXECUTOR.submit(call) for call in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,387 @@
+from concurrent.futures import Future
+from typing import Dict, Iterator, Optional
+import requests
+import hashlib
+import logging
+import orjson
+import queue
+import random
+import threading
+import time
+from json import JSONDecodeError
+from urllib3.exceptions import ReadTimeoutError
+from app.models._http import make_session
+from app.models._response_cache import ResponseCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connection failures are retried with jittered exponential backoff.
+# Timeouts are not: each one already cost the full timeout.
+_MAX_ATTEMPTS = 3
+_BACKOFF_BASE = 0.5
+_BACKOFF_MAX = 8.0
+
+# Read size for streamed replies (requests defaults to 512 bytes)
+_STREAM_READ_SIZE = 8192
+
+# Marks the end of a buffered stream in generate_stream's queue
+_STREAM_END = object()
+
+
+class CircuitBreaker:
+    """
+    CircuitBreaker stops sending requests to Ollama for a cool-down
+    period after repeated consecutive failures, so a degraded backend
+    fails fast instead of costing every caller a full timeout. Once the
+    cool-down ends, a single trial request is let through; its outcome
+    closes the breaker or starts another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker
+            reset_timeout (float): Seconds to stay open before letting a trial
+                request through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.fail_count = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self._lock:
+            if self.fail_count < self.failure_threshold:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: admit this caller as the trial and hold back the
+            # rest until it succeeds or a new cool-down runs out
+            self.opened_at = now
+            return True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful request."""
+        with self._lock:
+            self.fail_count = 0
+
+    def record_failure(self) -> None:
+        """Count a failed request, (re)opening the breaker at the threshold."""
+        with self._lock:
+            self.fail_count += 1
+            if self.fail_count >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# All clients talk to the same Ollama server, so they share one breaker
+_BREAKER = CircuitBreaker()
+
+
+class OllamaClient:
+    """
+    OllamaClient is the single place that talks to the Ollama HTTP API,
+    shared by every model role so they all draw on one connection pool.
+
+    Ollama reuses its KV cache for a prompt prefix it has just seen, so
+    the model prompt templates put their fixed instructions first and the
+    per-call content last.
+    """
+
+    def __init__(self, timeout: int = 60, base_url: str = "http://localhost:11434",
+                 max_parallel: int = 4):
+        """
+        Initialize the client.
+
+        Args:
+            timeout (int): Default seconds to wait for a generation before
+                giving up
+            base_url (str): Root URL of the Ollama server
+            max_parallel (int): Most generations sent to Ollama at once,
+                normally its OLLAMA_NUM_PARALLEL; extra calls wait here
+                rather than queueing inside Ollama
+        """
+        # Every request to Ollama holds a slot, so the pool never needs
+        # more connections than there are slots
+        self._slots = threading.BoundedSemaphore(max_parallel)
+        self.session = make_session(max_parallel)
+        self.breaker = _BREAKER
+        self.cache = ResponseCache()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.timeout = timeout
+        self.api_url = f"{base_url}/api/generate"
+
+    def generate(self, model: str, prompt: str, format: Optional[str] = None,
+                 timeout: Optional[float] = None, cache: bool = False,
+                 coalesce: bool = False) -> Dict:
+        """
+        Run a generation, streaming it from Ollama and accumulating the chunks.
+
+        Streaming avoids Ollama's slow non-streaming path; the result keeps
+        the non-streaming shape, with the full text under 'response'.
+
+        Args:
+            model (str): Name of the Ollama model to use
+            prompt (str): The prompt to send to the model
+            format (Optional[str]): Ollama output format, e.g. 'json'
+            timeout (Optional[float]): Seconds to wait for this call, in
+                place of the client default
+            cache (bool): Generate at temperature 0 and serve repeats of
+                the exact same request from the in-memory cache; implies
+                coalesce
+            coalesce (bool): Let concurrent callers making the exact same
+                request share a single Ollama call and its result
+
+        Returns:
+            Dict: The final API chunk with the accumulated 'response' text
+
+        Raises:
+            ConnectionError: If cannot connect to Ollama, or the circuit
+                breaker is open after repeated failures
+            TimeoutError: If Ollama does not answer within the timeout
+            ValueError: If response is invalid
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        if format:
+            payload["format"] = format
+
+        if cache:
+            payload["options"] = {"temperature": 0}
+        if not (cache or coalesce):
+            return self._send(payload, timeout or self.timeout)
+
+        key = hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        if cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Single-flight: the first caller runs the request, later identical
+        # callers wait for its result instead of queueing a duplicate
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                owned = self._inflight[key] = Future()
+        if pending is not None:
+            return dict(pending.result())
+
+        try:
+            result = self._send(payload, timeout or self.timeout)
+        except BaseException as e:
+            owned.set_exception(e)
+            raise
+        else:
+            if cache:
+                self.cache.put(key, result)
+            owned.set_result(result)
+            return dict(result)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _send(self, payload: Dict, timeout: float) -> Dict:
+        """Post the payload with retries, guarded by the circuit breaker."""
+        if not self.breaker.allow():
+            logger.warning("Ollama circuit breaker is open, failing fast")
+            raise ConnectionError("AI service is unavailable")
+
+        # The breaker counts logical calls, so it only hears about a
+        # failure once the retries are used up
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                with self._slots:
+                    result = self._post(payload, timeout)
+            except ConnectionError:
+                if attempt == _MAX_ATTEMPTS:
+                    self.breaker.record_failure()
+                    raise
+                delay = random.uniform(0, min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt))
+                logger.warning("Retrying Ollama request in %.2fs (attempt %d failed)", delay, attempt)
+                time.sleep(delay)
+            except TimeoutError:
+                self.breaker.record_failure()
+                raise
+            except ValueError:
+                # Ollama answered, so the backend itself is reachable
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def preload(self, model: str) -> None:
+        """
+        Load a model into Ollama's memory without generating anything.
+
+        This skips the retries and the circuit breaker, so a preload sent
+        before Ollama is up does not hold back the first real requests.
+
+        Args:
+            model (str): Name of the Ollama model to load
+
+        Raises:
+            ConnectionError: If cannot connect to Ollama
+            TimeoutError: If the model does not load within the timeout
+            ValueError: If response is invalid
+        """
+        # Ollama treats an empty prompt as a request to just load the model
+        with self._slots:
+            self._post({"model": model, "prompt": "", "stream": True}, self.timeout)
+
+    def generate_stream(self, model: str, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Run a generation and yield its text pieces as Ollama produces them.
+
+        Unlike generate(), a failed stream is not retried, since part of the
+        reply may already have been passed on.
+
+        The reply is read from Ollama on a background thread into a buffer,
+        so a generation slot is held only while Ollama is generating, not
+        while a slow consumer catches up. Closing the generator early stops
+        the read at the next chunk.
+
+        Args:
+            model (str): Name of the Ollama model to use
+            prompt (str): The prompt to send to the model
+            timeout (Optional[float]): Seconds to wait for each read, in
+                place of the client default
+
+        Yields:
+            str: Successive non-empty pieces of the 'response' text
+
+        Raises:
+            ConnectionError: If cannot connect to Ollama, or the circuit
+                breaker is open after repeated failures
+            TimeoutError: If Ollama does not answer within the timeout
+            ValueError: If response is invalid
+        """
+        if not self.breaker.allow():
+            logger.warning("Ollama circuit breaker is open, failing fast")
+            raise ConnectionError("AI service is unavailable")
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        # Text pieces, then _STREAM_END or the exception that ended the read
+        buffer: "queue.Queue" = queue.Queue()
+        abandoned = threading.Event()
+
+        def read():
+            try:
+                with self._slots:
+                    for chunk in self._stream_chunks(payload, timeout or self.timeout):
+                        if abandoned.is_set():
+                            # Leaving the loop closes the reply and frees the slot
+                            return
+                        piece = chunk.get("response")
+                        if piece:
+                            buffer.put(piece)
+            except (ConnectionError, TimeoutError) as e:
+                self.breaker.record_failure()
+                buffer.put(e)
+            except ValueError as e:
+                # Ollama answered, so the backend itself is reachable
+                self.breaker.record_success()
+                buffer.put(e)
+            except Exception as e:
+                buffer.put(e)
+            else:
+                self.breaker.record_success()
+                buffer.put(_STREAM_END)
+
+        # A thread of its own rather than the shared executor, whose workers
+        # the same request may be waiting on (e.g. for the moderation)
+        threading.Thread(target=read, name="ollama-stream", daemon=True).start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            abandoned.set()
+
+    def _post(self, payload: Dict, timeout: float) -> Dict:
+        """Send one generate request and accumulate its streamed reply."""
+        return self._accumulate_stream(self._stream_chunks(payload, timeout))
+
+    def _stream_chunks(self, payload: Dict, timeout: float) -> Iterator[Dict]:
+        """Send one generate request and yield its parsed NDJSON chunks, translating transport errors."""
+        try:
+            with self.session.post(
+                self.api_url,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                chunk: Dict = {}
+                # Read to the end of the body (the 'done' chunk is last) so the
+                # connection goes back to the pool instead of being closed. Chunked
+                # replies are still yielded as they arrive; the larger read size
+                # only cuts loop iterations when several lines arrive at once.
+                for line in response.iter_lines(chunk_size=_STREAM_READ_SIZE):
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    if "error" in chunk:
+                        raise ValueError(f"Ollama error: {chunk['error']}")
+                    yield chunk
+
+                if not chunk.get("done"):
+                    raise ValueError("Incomplete response from AI service")
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            # requests reports a read timeout in the middle of a streamed
+            # body as a ConnectionError wrapping urllib3's ReadTimeoutError
+            if e.args and isinstance(e.args[0], ReadTimeoutError):
+                logger.error("Request to Ollama timed out")
+                raise TimeoutError("Request took too long to process")
+            logger.error("Failed to connect to Ollama service")
+            raise ConnectionError("AI service is unavailable")
+        except requests.exceptions.Timeout:
+            logger.error("Request to Ollama timed out")
+            raise TimeoutError("Request took too long to process")
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code
+            # A 5xx means Ollama is up but failing (e.g. overloaded), which
+            # is retried and counted like a connection failure
+            if status >= 500:
+                logger.error("Ollama service returned HTTP %d", status)
+                raise ConnectionError("AI service is unavailable")
+            logger.error("Ollama rejected the request with HTTP %d", status)
+            raise ValueError(f"AI service rejected the request (HTTP {status})")
+        except JSONDecodeError:
+            logger.error("Received invalid JSON response from Ollama")
+            raise ValueError("Invalid response from AI service")
+        except Exception as e:
+            logger.error("Unexpected error in API request: %s", e)
+            raise
+
+    @staticmethod
+    def _accumulate_stream(chunks: Iterator[Dict]) -> Dict:
+        """Join the 'response' pieces of a streamed reply into its final chunk."""
+        pieces = []
+        append = pieces.append
+        chunk: Dict = {}
+        for chunk in chunks:
+            piece = chunk.get("response")
+            if piece:
+                append(piece)
+
+        chunk["response"] = "".join(pieces)
+        return chunk
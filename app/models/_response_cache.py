@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of Ollama results keyed by the exact request,
+    with entries expiring after a fixed time-to-live.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0):
+        """
+        Initialize an empty response cache.
+
+        Args:
+            maxsize (int): Maximum number of entries kept before the least
+                recently used one is evicted
+            ttl (float): Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Request key
+
+        Returns:
+            Optional[Dict]: A copy of the cached result, or None on a miss
+                or if the entry has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key: str, result: Dict) -> None:
+        """
+        Store a result, evicting the oldest entry if full.
+
+        Args:
+            key (str): Request key
+            result (Dict): The result to cache
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from typing import Any, Optional
+import re
+import threading
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class TopicCache:
+    """
+    In-process LRU cache keyed by debate topic, normalized so that case,
+    punctuation and spacing differences still hit the same entry.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Initialize an empty topic cache.
+
+        Args:
+            maxsize (int): Maximum number of topics kept before the least
+                recently used one is evicted
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(topic: str) -> str:
+        """Lower-case the topic and strip punctuation and extra whitespace."""
+        return " ".join(_WORD_RE.findall(topic.lower()))
+
+    def get(self, topic: str) -> Optional[Any]:
+        """
+        Look up a cached value for the topic.
+
+        Only the same words in the same order count as a hit: changing a
+        single word can reverse what a topic means.
+
+        Args:
+            topic (str): The debate topic
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss
+        """
+        key = self._normalize(topic)
+        if not key:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, topic: str, value: Any) -> None:
+        """
+        Store a value for the topic, evicting the oldest entry if full.
+
+        Args:
+            topic (str): The debate topic
+            value (Any): The value to cache
+        """
+        key = self._normalize(topic)
+        if not key:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
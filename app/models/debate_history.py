@@ -0,0 +1,114 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import os
+
+# Per-turn character cap so one long turn can't blow up prompt size
+_MAX_ENTRY_CHARS = int(os.getenv("DEBATE_MAX_ENTRY_CHARS", "400"))
+
+
+# Labels for the sides the app uses; anything else is upper-cased on insert
+_SIDE_LABELS = {'for': 'FOR', 'against': 'AGAINST', 'moderator': 'MODERATOR', '': ''}
+
+
+def _trim(text: str) -> str:
+    """Keep at most _MAX_ENTRY_CHARS of the text, preferring its tail."""
+    if len(text) <= _MAX_ENTRY_CHARS:
+        return text
+    return "..." + text[-(_MAX_ENTRY_CHARS - 3):]
+
+
+class DebateHistory:
+    """
+    DebateHistory stores debate turns as parallel side/text columns so
+    prompt context can be formatted straight from a slice of each.
+    """
+
+    def __init__(self):
+        """Initialize an empty history."""
+        self.sides: List[str] = []  # Upper-cased on insert, '' if unknown
+        self.texts: List[str] = []
+        # Formatted tails by (n, max_chars); cleared whenever a turn is added
+        self._formatted: Dict[Tuple[int, Optional[int]], str] = {}
+
+    @classmethod
+    def from_entries(cls, entries: Union["DebateHistory", Iterable[Union[Dict, str]]]) -> "DebateHistory":
+        """
+        Build a history from request data, converting each entry once.
+
+        Args:
+            entries: An existing DebateHistory (returned unchanged), or
+                {'side': ..., 'text': ...} dicts and/or plain strings
+
+        Returns:
+            DebateHistory: The converted history
+        """
+        if isinstance(entries, cls):
+            return entries
+
+        history = cls()
+        for entry in entries or []:
+            if isinstance(entry, dict):
+                history.append(entry.get('side', ''), entry.get('text', ''))
+            else:
+                history.append('', str(entry))
+        return history
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def head(self, n: int) -> "DebateHistory":
+        """
+        Return a new history holding only the first n turns.
+
+        Args:
+            n (int): Number of turns to keep
+
+        Returns:
+            DebateHistory: The shortened copy
+        """
+        history = DebateHistory()
+        history.sides = self.sides[:n]
+        history.texts = self.texts[:n]
+        return history
+
+    def append(self, side: str, text: str) -> None:
+        """
+        Add a turn to the end of the history, trimming over-long text.
+
+        Args:
+            side (str): Who spoke ('for', 'against', 'moderator'), or ''
+            text (str): What was said
+        """
+        self.sides.append(_SIDE_LABELS.get(side) or side.upper())
+        self.texts.append(_trim(text))
+        self._formatted.clear()
+
+    def tail_formatted(self, n: int, max_chars: Optional[int] = None) -> str:
+        """
+        Format the last n turns as prompt context, one 'SIDE: text' per line.
+
+        The result is memoized until the next append, since every prompt
+        built in a round formats the same history.
+
+        Args:
+            n (int): Number of most recent turns to include
+            max_chars (Optional[int]): Total size cap; the oldest of the n
+                turns are dropped first, but the newest is always kept
+
+        Returns:
+            str: The formatted turns
+        """
+        cached = self._formatted.get((n, max_chars))
+        if cached is not None:
+            return cached
+
+        lines = [
+            f"{side}: {text}" if side else text
+            for side, text in zip(self.sides[-n:], self.texts[-n:])
+        ]
+        if max_chars is not None:
+            total = sum(len(line) + 1 for line in lines) - 1
+            while len(lines) > 1 and total > max_chars:
+                total -= len(lines.pop(0)) + 1
+        formatted = "\n".join(lines)
+        self._formatted[(n, max_chars)] = formatted
+        return formatted
@@ -1,108 +1,86 @@
-import requests
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Union
 import logging
-from json import JSONDecodeError
+from app.models._ollama_client import OllamaClient
+from app.models.debate_history import DebateHistory
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Turns on the same debate differ only in the stance and the discussion
+# so far, which go after the instructions and topic.
+_DEBATE_PROMPT_TMPL = (
+    "You are participating in a casual debate.\n\n"
+    "Respond in a conversational way by:\n"
+    "1. Using natural, casual language\n"
+    "2. Keeping it brief (1-2 sentences)\n"
+    "3. Making it feel like a real-time discussion\n"
+    "4. Starting with phrases like 'Actually...', 'I see your point, but...', 'Let me add...'\n"
+    "5. Being engaging but concise\n\n"
+    "Keep your response under 30 words and make it feel like a natural conversation.\n\n"
+    "Topic: {topic}\n"
+    "Your stance is: {stance}\n\n"
+    "Previous discussion:\n{context}"
+)
+
+# Prompt label for each valid stance, so turns don't re-upper-case it
+_STANCE_LABELS = {'for': 'FOR', 'against': 'AGAINST'}
+
 class DebateModel:
     """
     DebateModel handles the generation of debate arguments for each side
     using the specified Ollama model.
     """
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, client: Optional[OllamaClient] = None):
         """
         Initialize the debate model with specified Ollama model.
         
         Args:
             model_name (str): Name of the Ollama model to use
+            client (Optional[OllamaClient]): Shared Ollama client; a new
+                one is created if omitted
         """
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/generate"
-        logger.info(f"Initialized DebateModel with {model_name}")
+        self._client = client or OllamaClient()
+        self.timeout = 60
+        logger.info("Initialized DebateModel with %s", model_name)
 
     def _make_api_request(self, prompt: str) -> Dict:
-        """
-        Make a request to the Ollama API with error handling.
+        """Send the prompt to this model through the shared Ollama client."""
+        return self._client.generate(self.model_name, prompt, timeout=self.timeout)
+
+    def _build_prompt(self, topic: str, context: Union[DebateHistory, List], stance: str) -> str:
+        """Validate the inputs and fill in the debate prompt template."""
+        if not topic or not stance:
+            raise ValueError("Topic and stance are required")
         
-        Args:
-            prompt (str): The prompt to send to the model
-            
-        Returns:
-            Dict: The API response
-            
-        Raises:
-            ConnectionError: If cannot connect to Ollama
-            ValueError: If response is invalid
-        """
-        try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=60  # Increased from 30 to 60 seconds
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            logger.error("Failed to connect to Ollama service")
-            raise ConnectionError("AI service is unavailable")
-        except requests.exceptions.Timeout:
-            logger.error("Request to Ollama timed out")
-            raise TimeoutError("Request took too long to process")
-        except JSONDecodeError:
-            logger.error("Received invalid JSON response from Ollama")
-            raise ValueError("Invalid response from AI service")
-        except Exception as e:
-            logger.error(f"Unexpected error in API request: {str(e)}")
-            raise
+        stance_label = _STANCE_LABELS.get(stance)
+        if stance_label is None:
+            raise ValueError("Stance must be either 'for' or 'against'")
 
-    def generate_response(self, topic: str, context: List[str], stance: str) -> Dict:
+        # Create the context string with clear debate history
+        history = DebateHistory.from_entries(context)
+        context_formatted = history.tail_formatted(3)  # Look at last 3 exchanges
+
+        return _DEBATE_PROMPT_TMPL.format(
+            topic=topic,
+            stance=stance_label,
+            context=context_formatted
+        )
+
+    def generate_response(self, topic: str, context: Union[DebateHistory, List], stance: str) -> Dict:
         """
         Generate the next argument in the debate sequence.
         
         Args:
             topic (str): The debate topic
-            context (List[str]): Previous debate arguments
+            context (Union[DebateHistory, List]): Previous debate arguments
             stance (str): Current side's position ('for' or 'against')
             
         Returns:
             Dict: Generated argument and metadata
         """
-        if not topic or not stance:
-            raise ValueError("Topic and stance are required")
-        
-        if stance not in ['for', 'against']:
-            raise ValueError("Stance must be either 'for' or 'against'")
-
-        # Create the context string with clear debate history
-        context_formatted = ""
-        if context:
-            for i, entry in enumerate(context[-3:]):  # Look at last 3 exchanges
-                if isinstance(entry, dict):
-                    side = entry['side'].upper()
-                    text = entry['text']
-                    context_formatted += f"{side}: {text}\n"
-                else:
-                    context_formatted += f"Point {i+1}: {entry}\n"
-
-        prompt = (
-            f"You are participating in a casual debate about: {topic}\n"
-            f"Your stance is: {stance.upper()}\n\n"
-            f"Previous discussion:\n{context_formatted}\n\n"
-            "Respond in a conversational way by:\n"
-            "1. Using natural, casual language\n"
-            "2. Keeping it brief (1-2 sentences)\n"
-            "3. Making it feel like a real-time discussion\n"
-            "4. Starting with phrases like 'Actually...', 'I see your point, but...', 'Let me add...'\n"
-            "5. Being engaging but concise\n\n"
-            "Keep your response under 30 words and make it feel like a natural conversation."
-        )
+        prompt = self._build_prompt(topic, context, stance)
         
         try:
             response = self._make_api_request(prompt)
@@ -112,5 +90,30 @@ class DebateModel:
                 
             return response
         except Exception as e:
-            logger.error(f"Failed to generate debate response: {str(e)}")
+            logger.error("Failed to generate debate response: %s", e)
+            raise
+
+    def stream_response(self, topic: str, context: Union[DebateHistory, List], stance: str) -> Iterator[str]:
+        """
+        Generate the next argument, yielding its text as it is produced.
+        
+        Args:
+            topic (str): The debate topic
+            context (Union[DebateHistory, List]): Previous debate arguments
+            stance (str): Current side's position ('for' or 'against')
+            
+        Yields:
+            str: Successive pieces of the argument
+        """
+        prompt = self._build_prompt(topic, context, stance)
+
+        try:
+            produced = False
+            for piece in self._client.generate_stream(self.model_name, prompt, timeout=self.timeout):
+                produced = True
+                yield piece
+            if not produced:
+                raise ValueError("Empty response from model")
+        except Exception as e:
+            logger.error("Failed to stream debate response: %s", e)
             raise
@@ -1,66 +1,60 @@
-from typing import Dict
-import requests
+from typing import Dict, Optional
 import logging
-from json import JSONDecodeError
+import re
+from app.models._ollama_client import OllamaClient
+from app.models._topic_cache import TopicCache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# The topic is the only variable part, so it closes the prompt after the
+# acceptance criteria.
+_FILTER_PROMPT_TMPL = (
+    "Analyze the debate topic below and determine if it is appropriate.\n\n"
+    "Consider these criteria:\n"
+    "1. Not harmful or promoting hate\n"
+    "2. Not explicitly graphic or violent\n"
+    "3. Suitable for constructive debate\n"
+    "4. Not personally targeting individuals\n\n"
+    "Return only 'true' if the topic is appropriate for debate, 'false' if not.\n"
+    "Include a brief reason for the decision.\n\n"
+    "Topic: {topic}"
+)
+
+# Pre-LLM screening: topics matching the denylist are rejected outright.
+# Everything else goes to the model; nothing is accepted without it.
+_DENY_RE = re.compile(
+    r"\b(?:how\s+to\s+(?:make|build)\s+(?:a\s+)?(?:bomb|explosive|weapon)s?"
+    r"|child\s+(?:porn\w*|sex\w*)"
+    r"|kill\s+(?:myself|yourself)"
+    r"|suicide\s+methods?)\b",
+    re.IGNORECASE
+)
+
 class FilterModel:
     """
     FilterModel screens debate topics for appropriateness and
     ensures topics are suitable for constructive debate.
     """
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, client: Optional[OllamaClient] = None):
         """
         Initialize the filter model with specified Ollama model.
         
         Args:
             model_name (str): Name of the Ollama model to use
+            client (Optional[OllamaClient]): Shared Ollama client; a new
+                one is created if omitted
         """
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/generate"
-        logger.info(f"Initialized FilterModel with {model_name}")
+        self._client = client or OllamaClient()
+        self.timeout = 30
+        self._cache = TopicCache()
+        logger.info("Initialized FilterModel with %s", model_name)
 
     def _make_api_request(self, prompt: str) -> Dict:
-        """
-        Make a request to the Ollama API with error handling.
-        
-        Args:
-            prompt (str): The prompt to send to the model
-            
-        Returns:
-            Dict: The API response
-            
-        Raises:
-            ConnectionError: If cannot connect to Ollama
-            ValueError: If response is invalid
-        """
-        try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=30  # Increased from 15 to 30 seconds
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            logger.error("Failed to connect to Ollama service")
-            raise ConnectionError("AI service is unavailable")
-        except requests.exceptions.Timeout:
-            logger.error("Request to Ollama timed out")
-            raise TimeoutError("Request took too long to process")
-        except JSONDecodeError:
-            logger.error("Received invalid JSON response from Ollama")
-            raise ValueError("Invalid response from AI service")
-        except Exception as e:
-            logger.error(f"Unexpected error in API request: {str(e)}")
-            raise
+        """Send the prompt to this model through the shared Ollama client."""
+        return self._client.generate(self.model_name, prompt, timeout=self.timeout, cache=True)
         
     def filter_topic(self, topic: str) -> Dict[str, bool]:
         """
@@ -78,19 +72,11 @@ class FilterModel:
         if not topic or len(topic.strip()) == 0:
             raise ValueError("Empty topic provided")
 
-        prompt = f"""
-        Analyze the following debate topic and determine if it is appropriate:
-        Topic: {topic}
-        
-        Consider these criteria:
-        1. Not harmful or promoting hate
-        2. Not explicitly graphic or violent
-        3. Suitable for constructive debate
-        4. Not personally targeting individuals
-        
-        Return only 'true' if the topic is appropriate for debate, 'false' if not.
-        Include a brief reason for the decision.
-        """
+        known = self.known_verdict(topic)
+        if known is not None:
+            return known
+
+        prompt = _FILTER_PROMPT_TMPL.format(topic=topic)
         
         try:
             response = self._make_api_request(prompt)
@@ -100,16 +86,60 @@ class FilterModel:
             is_appropriate = 'true' in result
             reason = result.replace('true', '').replace('false', '').strip()
             
-            logger.info(f"Topic '{topic}' filtered as {'appropriate' if is_appropriate else 'inappropriate'}")
+            logger.info("Topic '%s' filtered as %s", topic, "appropriate" if is_appropriate else "inappropriate")
             
-            return {
+            result = {
                 "is_appropriate": is_appropriate,
                 "reason": reason or "Topic analyzed for appropriateness"
             }
+            self._cache.put(topic, result)
+            return dict(result)
         except Exception as e:
-            logger.error(f"Failed to filter topic: {str(e)}")
+            logger.error("Failed to filter topic: %s", e)
             # Default to rejecting topic on error
             return {
                 "is_appropriate": False,
                 "reason": "Unable to verify topic appropriateness"
             }
+
+    def known_verdict(self, topic: str) -> Optional[Dict[str, bool]]:
+        """
+        Return the verdict for a topic if it can be given without the model.
+        
+        Args:
+            topic (str): The proposed debate topic
+            
+        Returns:
+            Optional[Dict[str, bool]]: A denylist rejection or the cached
+                verdict, or None if filter_topic would call the model
+        """
+        screened = self._screen_topic(topic)
+        if screened is not None:
+            return screened
+
+        # Reuse the verdict for this exact (normalized) topic
+        cached = self._cache.get(topic)
+        if cached is not None:
+            logger.info("Topic '%s' served from filter cache", topic)
+            return dict(cached)
+        return None
+
+    @staticmethod
+    def _screen_topic(topic: str) -> Optional[Dict[str, bool]]:
+        """
+        Reject clearly blocked topics without calling the model.
+        
+        Args:
+            topic (str): The proposed debate topic
+            
+        Returns:
+            Optional[Dict[str, bool]]: A rejection, or None if the model
+                needs to decide
+        """
+        if _DENY_RE.search(topic):
+            logger.info("Topic '%s' rejected by denylist", topic)
+            return {
+                "is_appropriate": False,
+                "reason": "Topic matches a blocked subject"
+            }
+        return None
@@ -1,118 +1,181 @@
-from typing import Dict, List
-import requests
+from typing import Any, Dict, List, Optional, Union
 import logging
-from json import JSONDecodeError
+import json
+import os
+import re
+from app.models._ollama_client import OllamaClient
+from app.models.debate_history import DebateHistory
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Total size cap for the history included in a moderator prompt
+_MAX_MODERATOR_CONTEXT = int(os.getenv("DEBATE_MAX_SUMMARY_CONTEXT", "4000"))
+
+# Number of most recent turns every moderator prompt shows
+_CONTEXT_TURNS = 5
+
+# Every moderator prompt starts with the same preamble, topic and history
+# and puts its task last, so a summary requested right after a verdict on
+# the same history reuses Ollama's KV cache for the whole shared prefix.
+_PREFIX_TMPL = (
+    "You are the impartial moderator of a debate.\n\n"
+    "Topic: {topic}\n\n"
+    "Debate History:\n{context}\n\n"
+)
+
+_MODERATE_TASK_TMPL = (
+    "### Task: evaluate the current argument below in the context of the debate "
+    "and decide whether you need to intervene.\n\n"
+    "Check for:\n"
+    "1. Off-topic discussion\n"
+    "2. Circular arguments\n"
+    "3. Logical fallacies\n"
+    "4. Need for summary\n\n"
+    "Return only a JSON object with these keys:\n"
+    "1. is_on_topic (true/false)\n"
+    "2. is_circular (true/false)\n"
+    "3. is_logical (true/false)\n"
+    "4. needs_intervention (true/false)\n"
+    "5. feedback (brief moderator feedback, including the reason for any intervention)\n\n"
+    "Current Argument: {argument}"
+)
+
+_SUMMARY_TASK = (
+    "### Task: provide a brief, impartial summary of the debate above.\n\n"
+    "Focus on:\n"
+    "1. Key arguments from both sides\n"
+    "2. Main points of contention\n"
+    "3. Current state of the debate\n\n"
+    "Keep the summary concise and neutral."
+)
+
+# Verdict flags and the value assumed when the moderator omits one
+_VERDICT_DEFAULTS = {
+    'is_on_topic': True,
+    'is_circular': False,
+    'is_logical': True,
+    'needs_intervention': False
+}
+
+# Fallback for verdicts that are not valid JSON, e.g. "is_circular: false"
+_FLAG_RES = {
+    flag: re.compile(rf"{flag}\W+(true|false)", re.IGNORECASE)
+    for flag in _VERDICT_DEFAULTS
+}
+
 class ModeratorModel:
     """
     ModeratorModel manages debate quality by monitoring arguments,
     providing interventions, and generating summaries.
     """
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, client: Optional[OllamaClient] = None):
         """
         Initialize the moderator model with specified Ollama model.
         
         Args:
             model_name (str): Name of the Ollama model to use
+            client (Optional[OllamaClient]): Shared Ollama client; a new
+                one is created if omitted
         """
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/generate"
-        logger.info(f"Initialized ModeratorModel with {model_name}")
+        self._client = client or OllamaClient()
+        self.timeout = 60
+        logger.info("Initialized ModeratorModel with %s", model_name)
+
+    def _make_api_request(self, prompt: str, format: Optional[str] = None) -> Dict:
+        """Send the prompt to this model through the shared Ollama client."""
+        return self._client.generate(
+            self.model_name, prompt, format=format, timeout=self.timeout, coalesce=True
+        )
 
-    def _make_api_request(self, prompt: str) -> Dict:
+    @staticmethod
+    def _prompt_prefix(topic: str, history: DebateHistory) -> str:
+        """Build the topic and history prefix shared by every moderator prompt."""
+        context_str = history.tail_formatted(_CONTEXT_TURNS, max_chars=_MAX_MODERATOR_CONTEXT)
+        return _PREFIX_TMPL.format(topic=topic, context=context_str)
+
+    def moderate_turn(self, topic: str, current_argument: str, debate_history: Union[DebateHistory, List]) -> Dict:
         """
-        Make a request to the Ollama API with error handling.
+        Evaluate an argument and decide on intervention in a single model call.
         
         Args:
-            prompt (str): The prompt to send to the model
+            topic (str): The debate topic
+            current_argument (str): The argument to evaluate
+            debate_history (Union[DebateHistory, List]): Previous debate arguments
             
         Returns:
-            Dict: The API response
-            
-        Raises:
-            ConnectionError: If cannot connect to Ollama
-            ValueError: If response is invalid
+            Dict: is_on_topic, is_circular, is_logical and needs_intervention
+                flags plus moderator feedback
         """
+        if not current_argument:
+            raise ValueError("No argument provided for evaluation")
+
+        history = DebateHistory.from_entries(debate_history)
+        prompt = self._prompt_prefix(topic, history) + _MODERATE_TASK_TMPL.format(
+            argument=current_argument
+        )
+        
         try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=60  # Increased from 30 to 60 seconds
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            logger.error("Failed to connect to Ollama service")
-            raise ConnectionError("AI service is unavailable")
-        except requests.exceptions.Timeout:
-            logger.error("Request to Ollama timed out")
-            raise TimeoutError("Request took too long to process")
-        except JSONDecodeError:
-            logger.error("Received invalid JSON response from Ollama")
-            raise ValueError("Invalid response from AI service")
+            response = self._make_api_request(prompt, format="json")
+            return self._parse_verdict(response['response'])
         except Exception as e:
-            logger.error(f"Unexpected error in API request: {str(e)}")
+            logger.error("Failed to moderate turn: %s", e)
             raise
 
-    def evaluate_response(self, topic: str, current_argument: str, debate_history: List[str]) -> Dict:
+    @staticmethod
+    def _parse_verdict(result: str) -> Dict:
+        """Turn the moderator's reply into flags and feedback."""
+        data: Optional[Dict[str, Any]] = None
+        try:
+            parsed = json.loads(result)
+            if isinstance(parsed, dict):
+                data = parsed
+        except ValueError:
+            pass
+
+        if data is None:
+            # Scan the raw text for each flag instead
+            data = {}
+            for flag, pattern in _FLAG_RES.items():
+                match = pattern.search(result)
+                if match:
+                    data[flag] = match.group(1)
+            data['feedback'] = result.strip()
+
+        verdict = {}
+        for flag, default in _VERDICT_DEFAULTS.items():
+            value = data.get(flag, default)
+            verdict[flag] = value if isinstance(value, bool) else 'true' in str(value).lower()
+        verdict['feedback'] = str(data.get('feedback') or '').strip()
+        return verdict
+
+    def evaluate_response(self, topic: str, current_argument: str, debate_history: Union[DebateHistory, List]) -> Dict:
         """
         Evaluate the quality and relevance of a debate argument.
         
         Args:
             topic (str): The debate topic
             current_argument (str): The argument to evaluate
-            debate_history (List[str]): Previous debate arguments
+            debate_history (Union[DebateHistory, List]): Previous debate arguments
             
         Returns:
             Dict: Evaluation results including on-topic, circular, logical ratings
         """
-        if not current_argument:
-            raise ValueError("No argument provided for evaluation")
+        verdict = self.moderate_turn(topic, current_argument, debate_history)
+        return {
+            key: verdict[key]
+            for key in ('is_on_topic', 'is_circular', 'is_logical', 'feedback')
+        }
 
-        # Convert debate history items to strings if they're dictionaries
-        formatted_history = []
-        for entry in debate_history[-3:]:  # Get last 3 exchanges
-            if isinstance(entry, dict):
-                formatted_history.append(f"{entry['side'].upper()}: {entry['text']}")
-            else:
-                formatted_history.append(str(entry))
-
-        context_str = '\n'.join(formatted_history)
-
-        prompt = (
-            f"As a debate moderator, evaluate the following argument in the context of the debate:\n\n"
-            f"Topic: {topic}\n"
-            f"Current Argument: {current_argument}\n\n"
-            f"Previous Discussion:\n{context_str}\n\n"
-            "Analyze and return a JSON-like response with these keys:\n"
-            "1. is_on_topic (true/false)\n"
-            "2. is_circular (true/false)\n"
-            "3. is_logical (true/false)\n"
-            "4. feedback (brief moderator feedback)"
-        )
-        
-        try:
-            response = self._make_api_request(prompt)
-            return response
-        except Exception as e:
-            logger.error(f"Failed to evaluate response: {str(e)}")
-            raise
-
-    def generate_summary(self, topic: str, debate_history: List[str]) -> str:
+    def generate_summary(self, topic: str, debate_history: Union[DebateHistory, List]) -> str:
         """
         Generate a concise summary of the debate's current state.
         
         Args:
             topic (str): The debate topic
-            debate_history (List[str]): All previous debate arguments
+            debate_history (Union[DebateHistory, List]): All previous debate arguments
             
         Returns:
             str: A summary of the debate
@@ -120,41 +183,23 @@ class ModeratorModel:
         if not debate_history:
             raise ValueError("No debate history provided for summary")
 
-        # Convert debate history items to strings if they're dictionaries
-        formatted_history = []
-        for entry in debate_history[-5:]:  # Get last 5 exchanges
-            if isinstance(entry, dict):
-                formatted_history.append(f"{entry['side'].upper()}: {entry['text']}")
-            else:
-                formatted_history.append(str(entry))
-
-        context_str = '\n'.join(formatted_history)
-
-        prompt = (
-            f"Provide a brief, impartial summary of the following debate:\n\n"
-            f"Topic: {topic}\n\n"
-            f"Debate History:\n{context_str}\n\n"
-            "Focus on:\n"
-            "1. Key arguments from both sides\n"
-            "2. Main points of contention\n"
-            "3. Current state of the debate\n\n"
-            "Keep the summary concise and neutral."
-        )
+        history = DebateHistory.from_entries(debate_history)
+        prompt = self._prompt_prefix(topic, history) + _SUMMARY_TASK
         
         try:
             response = self._make_api_request(prompt)
             return response['response']
         except Exception as e:
-            logger.error(f"Failed to generate summary: {str(e)}")
+            logger.error("Failed to generate summary: %s", e)
             raise
 
-    def should_intervene(self, topic: str, debate_history: List[str]) -> Dict:
+    def should_intervene(self, topic: str, debate_history: Union[DebateHistory, List]) -> Dict:
         """
         Determine if moderator intervention is needed in the debate.
         
         Args:
             topic (str): The debate topic
-            debate_history (List[str]): Previous debate arguments
+            debate_history (Union[DebateHistory, List]): Previous debate arguments
             
         Returns:
             Dict: Decision about intervention and reason
@@ -162,39 +207,16 @@ class ModeratorModel:
         if not debate_history:
             return {"needs_intervention": False, "reason": "Debate hasn't started yet"}
 
-        # Convert debate history items to strings if they're dictionaries
-        formatted_history = []
-        for entry in debate_history[-3:]:  # Get last 3 exchanges
-            if isinstance(entry, dict):
-                formatted_history.append(f"{entry['side'].upper()}: {entry['text']}")
-            else:
-                formatted_history.append(str(entry))
-
-        context_str = '\n'.join(formatted_history)
-
-        prompt = (
-            f"Analyze this debate and determine if moderator intervention is needed:\n\n"
-            f"Topic: {topic}\n\n"
-            f"Recent Discussion:\n{context_str}\n\n"
-            "Check for:\n"
-            "1. Off-topic discussion\n"
-            "2. Circular arguments\n"
-            "3. Logical fallacies\n"
-            "4. Need for summary\n\n"
-            "Return true if intervention needed, false if not, and include reason."
-        )
-        
+        history = DebateHistory.from_entries(debate_history)
+
         try:
-            response = self._make_api_request(prompt)
-            result = response['response'].lower()
-            needs_intervention = 'true' in result
-            
+            verdict = self.moderate_turn(topic, history.texts[-1], history)
             return {
-                "needs_intervention": needs_intervention,
-                "reason": result
+                "needs_intervention": verdict['needs_intervention'],
+                "reason": verdict['feedback']
             }
         except Exception as e:
-            logger.error(f"Failed to determine intervention need: {str(e)}")
+            logger.error("Failed to determine intervention need: %s", e)
             return {
                 "needs_intervention": False,
                 "reason": "Error in intervention check"
@@ -1,73 +1,127 @@
-from typing import Dict, Tuple
-import requests
+from typing import Dict, Optional, Tuple
 import logging
-from json import JSONDecodeError
+import hashlib
+import json
+import orjson
+import re
+from app.models._ollama_client import OllamaClient
+from app.models._http import run_concurrently
+from app.models import _disk_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Setup prompts, run once per new topic. Each ends with the topic and,
+# where needed, the stances it asks about.
+_STANCES_PROMPT_TMPL = (
+    "You are helping set up a debate about the topic given at the end.\n\n"
+    "Generate exactly two opposing stances in this exact format:\n"
+    "FOR: (write a one-sentence stance supporting the topic)\n"
+    "AGAINST: (write a one-sentence stance opposing the topic)\n\n"
+    "Make each stance clear and specific. Do not add any other text.\n"
+    "Example format:\n"
+    "FOR: Remote work increases productivity and work-life balance while reducing commute times and environmental impact.\n"
+    "AGAINST: Traditional office work promotes better collaboration, team cohesion, and work-life separation while ensuring proper oversight.\n\n"
+    "Topic: '{topic}'"
+)
+
+_RETRY_STANCES_PROMPT_TMPL = (
+    "1. Write one sentence supporting the topic below.\n"
+    "2. Write one sentence opposing the topic below.\n"
+    "Be clear and specific.\n\n"
+    "Topic: {topic}"
+)
+
+_SYSTEM_PROMPT_TMPL = (
+    "Create a system prompt for an AI debater who argues the stance given below.\n\n"
+    "The system prompt should include:\n"
+    "1. Clear definition of the AI's role and perspective\n"
+    "2. Guidelines for maintaining respectful discourse\n"
+    "3. Requirements for using logic and evidence\n"
+    "4. Instructions for keeping responses focused and concise\n"
+    "5. Strategies for addressing counter-arguments\n\n"
+    "Return only the system prompt, no explanations.\n"
+    "Make it clear and actionable.\n\n"
+    "Topic: \"{topic}\"\n"
+    "Stance: {stance}"
+)
+
+_SYSTEM_PROMPTS_PAIR_TMPL = (
+    "Create two system prompts for AI debaters, one for each stance given below.\n\n"
+    "Each system prompt should include:\n"
+    "1. Clear definition of the AI's role and perspective\n"
+    "2. Guidelines for maintaining respectful discourse\n"
+    "3. Requirements for using logic and evidence\n"
+    "4. Instructions for keeping responses focused and concise\n"
+    "5. Strategies for addressing counter-arguments\n\n"
+    "Return only a JSON object with two string fields, 'for_system' and 'against_system', "
+    "holding the system prompt for each stance. No explanations.\n"
+    "Make each prompt clear and actionable.\n\n"
+    "Topic: \"{topic}\"\n"
+    "FOR stance: {for_stance}\n"
+    "AGAINST stance: {against_stance}"
+)
+
+# Part of every persistent cache key, so editing a template retires the
+# entries it produced; bump _PARSER_VERSION when the parsing changes
+_PARSER_VERSION = "2"
+_TEMPLATE_VERSION = hashlib.sha256("\0".join((
+    _PARSER_VERSION,
+    _STANCES_PROMPT_TMPL,
+    _RETRY_STANCES_PROMPT_TMPL,
+    _SYSTEM_PROMPT_TMPL,
+    _SYSTEM_PROMPTS_PAIR_TMPL
+)).encode("utf-8")).hexdigest()[:16]
+
+# "FOR: ..." and "AGAINST: ..." lines anywhere in the response; the colon
+# is required so a preamble such as "For this topic:" is not taken
+_STANCE_LINE_RE = re.compile(
+    r"^[^\S\n]*(FOR|AGAINST):[^\S\n]*([^\n]*?\S)[^\S\n]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Fallback for pair responses that are not valid JSON
+_PAIR_MARKER_RE = re.compile(r"FOR[^:\n]*:\s*(.+?)\s*AGAINST[^:\n]*:\s*(.+)", re.IGNORECASE | re.DOTALL)
+
 class PromptModel:
     """
     PromptModel generates debate stances and system prompts for the debaters,
     helping to structure the debate and ensure quality arguments.
     """
 
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, client: Optional[OllamaClient] = None):
         """
         Initialize the prompt model with specified Ollama model.
         
         Args:
             model_name (str): Name of the Ollama model to use
+            client (Optional[OllamaClient]): Shared Ollama client; a new
+                one is created if omitted
         """
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/generate"
-        logger.info(f"Initialized PromptModel with {model_name}")
+        self._client = client or OllamaClient()
+        self.timeout = 60
+        logger.info("Initialized PromptModel with %s", model_name)
 
-    def _make_api_request(self, prompt: str) -> Dict:
-        """
-        Make a request to the Ollama API with error handling.
-        
-        Args:
-            prompt (str): The prompt to send to the model
-            
-        Returns:
-            Dict: The API response
-            
-        Raises:
-            ConnectionError: If cannot connect to Ollama
-            ValueError: If response is invalid
-        """
-        try:
-            response = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=60  # Increased from 20 to 60 seconds
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.ConnectionError:
-            logger.error("Failed to connect to Ollama service")
-            raise ConnectionError("AI service is unavailable")
-        except requests.exceptions.Timeout:
-            logger.error("Request to Ollama timed out")
-            raise TimeoutError("Request took too long to process")
-        except JSONDecodeError:
-            logger.error("Received invalid JSON response from Ollama")
-            raise ValueError("Invalid response from AI service")
-        except Exception as e:
-            logger.error(f"Unexpected error in API request: {str(e)}")
-            raise
+    def _make_api_request(self, prompt: str, format: Optional[str] = None) -> Dict:
+        """Send the prompt to this model through the shared Ollama client."""
+        return self._client.generate(self.model_name, prompt, format=format, timeout=self.timeout, cache=True)
     
-    def generate_stances(self, topic: str) -> Tuple[str, str]:
+    def _cache_key(self, kind: str, *parts: str) -> str:
+        """Build a persistent cache key from the templates, model and call inputs."""
+        # A JSON array keeps free-text parts apart, unlike joining on a separator
+        raw = orjson.dumps([kind, _TEMPLATE_VERSION, self.model_name, *parts])
+        return hashlib.sha256(raw).hexdigest()
+
+    def generate_stances(self, topic: str, persist: bool = True) -> Tuple[str, str]:
         """
         Generate two opposing stances for a debate topic.
         
         Args:
             topic (str): The debate topic
+            persist (bool): Save newly generated stances to the disk cache;
+                pass False when the topic has not been approved yet and
+                call save_stances once it is
             
         Returns:
             Tuple[str, str]: (for_stance, against_stance)
@@ -78,69 +132,88 @@ class PromptModel:
         if not topic or len(topic.strip()) == 0:
             raise ValueError("Empty topic provided")
 
-        prompt = (
-            f"You are helping set up a debate about: '{topic}'\n\n"
-            "Generate exactly two opposing stances in this exact format:\n"
-            "FOR: (write a one-sentence stance supporting the topic)\n"
-            "AGAINST: (write a one-sentence stance opposing the topic)\n\n"
-            "Make each stance clear and specific. Do not add any other text.\n"
-            "Example format:\n"
-            "FOR: Remote work increases productivity and work-life balance while reducing commute times and environmental impact.\n"
-            "AGAINST: Traditional office work promotes better collaboration, team cohesion, and work-life separation while ensuring proper oversight."
-        )
+        cache_key = self._cache_key("stances", topic)
+        cached = _disk_cache.get(cache_key)
+        if cached is not None:
+            for_stance, against_stance = json.loads(cached)
+            logger.info("Loaded cached stances for topic '%s'", topic)
+            return for_stance, against_stance
+
+        prompt = _STANCES_PROMPT_TMPL.format(topic=topic)
         
         try:
             response = self._make_api_request(prompt)
             result = response['response']
-            
-            # More robust parsing
-            for_stance = ""
-            against_stance = ""
-            
-            # Try multiple parsing methods
-            lines = [line.strip() for line in result.split('\n') if line.strip()]
-            for line in lines:
-                line = line.strip()
-                if line.upper().startswith('FOR:'):
-                    for_stance = line[4:].strip()
-                elif line.upper().startswith('AGAINST:'):
-                    against_stance = line[8:].strip()
-                # Backup parsing if colons are missing
-                elif line.upper().startswith('FOR '):
-                    for_stance = line[4:].strip()
-                elif line.upper().startswith('AGAINST '):
-                    against_stance = line[8:].strip()
-            
-            # If still empty, try to split the response differently
-            if not for_stance and not against_stance and len(lines) >= 2:
-                for_stance = lines[0].strip()
-                against_stance = lines[1].strip()
-            
-            # Clean up the stances
-            for_stance = for_stance.replace('FOR:', '').replace('FOR', '').strip()
-            against_stance = against_stance.replace('AGAINST:', '').replace('AGAINST', '').strip()
+            for_stance, against_stance = self._parse_stances(result)
             
             # Validate stances
             if len(for_stance) < 5 or len(against_stance) < 5:
-                logger.warning(f"Generated stances too short, retrying - Raw response: {result}")
+                logger.warning("Generated stances too short, retrying - Raw response: %s", result)
                 # Retry once with a simpler prompt
-                return self._retry_generate_stances(topic)
+                for_stance, against_stance = self._retry_generate_stances(topic)
             
-            logger.info(f"Successfully generated stances - For: '{for_stance}', Against: '{against_stance}'")
+            if persist:
+                self.save_stances(topic, for_stance, against_stance)
+            logger.info("Successfully generated stances - For: '%s', Against: '%s'", for_stance, against_stance)
             return for_stance, against_stance
             
         except Exception as e:
-            logger.error(f"Failed to generate stances for topic '{topic}': {str(e)}")
+            logger.error("Failed to generate stances for topic '%s': %s", topic, e)
             raise ValueError(f"Failed to generate debate stances: {str(e)}")
 
+    def save_stances(self, topic: str, for_stance: str, against_stance: str) -> None:
+        """
+        Cache stances for a topic so later debates on it skip the model.
+        
+        Args:
+            topic (str): The debate topic
+            for_stance (str): The FOR stance
+            against_stance (str): The AGAINST stance
+        """
+        _disk_cache.put(self._cache_key("stances", topic), json.dumps([for_stance, against_stance]))
+
+    @staticmethod
+    def _parse_stances(result: str) -> Tuple[str, str]:
+        """Extract the FOR and AGAINST stances from the model's response."""
+        # As in the line-by-line parsing, the last line for each side wins
+        stances = {side.upper(): text for side, text in _STANCE_LINE_RE.findall(result)}
+        if 'FOR' in stances and 'AGAINST' in stances:
+            for_stance, against_stance = stances['FOR'], stances['AGAINST']
+        else:
+            for_stance, against_stance = PromptModel._parse_stance_lines(result)
+
+        # Clean up the stances
+        for_stance = for_stance.replace('FOR:', '').replace('FOR', '').strip()
+        against_stance = against_stance.replace('AGAINST:', '').replace('AGAINST', '').strip()
+        return for_stance, against_stance
+
+    @staticmethod
+    def _parse_stance_lines(result: str) -> Tuple[str, str]:
+        """Line-by-line stance parsing for responses in looser formats."""
+        for_stance = ""
+        against_stance = ""
+        
+        lines = [line.strip() for line in result.split('\n') if line.strip()]
+        for line in lines:
+            if line.upper().startswith('FOR:'):
+                for_stance = line[4:].strip()
+            elif line.upper().startswith('AGAINST:'):
+                against_stance = line[8:].strip()
+            # Backup parsing if colons are missing
+            elif line.upper().startswith('FOR '):
+                for_stance = line[4:].strip()
+            elif line.upper().startswith('AGAINST '):
+                against_stance = line[8:].strip()
+        
+        # If still empty, try to split the response differently
+        if not for_stance and not against_stance and len(lines) >= 2:
+            for_stance = lines[0]
+            against_stance = lines[1]
+        return for_stance, against_stance
+
     def _retry_generate_stances(self, topic: str) -> Tuple[str, str]:
         """Fallback method with simpler prompt for generating stances."""
-        simple_prompt = (
-            f"Topic: {topic}\n\n"
-            "1. Write one sentence supporting this topic.\n"
-            "2. Write one sentence opposing this topic.\n"
-            "Be clear and specific."
-        )
+        simple_prompt = _RETRY_STANCES_PROMPT_TMPL.format(topic=topic)
         
         try:
             response = self._make_api_request(simple_prompt)
@@ -152,7 +225,7 @@ class PromptModel:
             else:
                 raise ValueError("Could not generate valid stances even with retry")
         except Exception as e:
-            logger.error(f"Retry failed for topic '{topic}': {str(e)}")
+            logger.error("Retry failed for topic '%s': %s", topic, e)
             raise ValueError("Failed to generate debate stances even with retry")
 
     def generate_system_prompt(self, stance: str, topic: str) -> str:
@@ -172,19 +245,13 @@ class PromptModel:
         if not stance or not topic:
             raise ValueError("Stance and topic are required")
 
-        prompt = f"""
-        Create a system prompt for an AI debater that will argue {stance} on the topic: "{topic}"
-        
-        The system prompt should include:
-        1. Clear definition of the AI's role and perspective
-        2. Guidelines for maintaining respectful discourse
-        3. Requirements for using logic and evidence
-        4. Instructions for keeping responses focused and concise
-        5. Strategies for addressing counter-arguments
-        
-        Return only the system prompt, no explanations.
-        Make it clear and actionable.
-        """
+        cache_key = self._cache_key("system_prompt", stance, topic)
+        cached = _disk_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Loaded cached system prompt for stance: %s", stance)
+            return cached
+
+        prompt = _SYSTEM_PROMPT_TMPL.format(stance=stance, topic=topic)
         
         try:
             response = self._make_api_request(prompt)
@@ -194,9 +261,80 @@ class PromptModel:
             if len(system_prompt) < 50:  # Basic validation
                 raise ValueError("Generated system prompt is too short")
                 
-            logger.info(f"Successfully generated system prompt for stance: {stance}")
+            _disk_cache.put(cache_key, system_prompt)
+            logger.info("Successfully generated system prompt for stance: %s", stance)
             return system_prompt
             
         except Exception as e:
-            logger.error(f"Failed to generate system prompt: {str(e)}")
+            logger.error("Failed to generate system prompt: %s", e)
             raise
+
+    def generate_system_prompts_pair(self, for_stance: str, against_stance: str, topic: str) -> Tuple[str, str]:
+        """
+        Create the system prompts for both debaters in a single model call.
+        
+        Args:
+            for_stance (str): The position the FOR debater argues
+            against_stance (str): The position the AGAINST debater argues
+            topic (str): The debate topic
+            
+        Returns:
+            Tuple[str, str]: (for_system_prompt, against_system_prompt)
+            
+        Raises:
+            ValueError: If stances or topic are invalid
+        """
+        if not for_stance or not against_stance or not topic:
+            raise ValueError("Stances and topic are required")
+
+        for_key = self._cache_key("system_prompt", for_stance, topic)
+        against_key = self._cache_key("system_prompt", against_stance, topic)
+        for_cached = _disk_cache.get(for_key)
+        against_cached = _disk_cache.get(against_key)
+        if for_cached is not None and against_cached is not None:
+            logger.info("Loaded cached system prompts for topic '%s'", topic)
+            return for_cached, against_cached
+
+        prompt = _SYSTEM_PROMPTS_PAIR_TMPL.format(
+            topic=topic,
+            for_stance=for_stance,
+            against_stance=against_stance
+        )
+        
+        try:
+            response = self._make_api_request(prompt, format="json")
+            for_prompt, against_prompt = self._parse_system_prompts_pair(response['response'])
+        except Exception as e:
+            logger.error("Failed to generate system prompt pair: %s", e)
+            for_prompt, against_prompt = "", ""
+
+        # Fall back to one call per side if the combined output is unusable
+        if len(for_prompt) < 50 or len(against_prompt) < 50:
+            logger.warning("System prompt pair unusable, generating each side separately")
+            return tuple(run_concurrently(
+                lambda: self.generate_system_prompt(for_stance, topic),
+                lambda: self.generate_system_prompt(against_stance, topic)
+            ))
+
+        _disk_cache.put(for_key, for_prompt)
+        _disk_cache.put(against_key, against_prompt)
+        logger.info("Successfully generated system prompts for topic '%s'", topic)
+        return for_prompt, against_prompt
+
+    @staticmethod
+    def _parse_system_prompts_pair(result: str) -> Tuple[str, str]:
+        """Extract the FOR and AGAINST prompts from a combined response."""
+        try:
+            data = json.loads(result)
+            if isinstance(data, dict):
+                return (
+                    str(data.get('for_system', '')).strip(),
+                    str(data.get('against_system', '')).strip()
+                )
+        except ValueError:
+            pass
+
+        match = _PAIR_MARKER_RE.search(result)
+        if match:
+            return match.group(1).strip(), match.group(2).strip()
+        return "", ""
@@ -1,50 +1,72 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
-from app.models.filter_model import FilterModel
-from app.models.prompt_model import PromptModel
-from app.models.debate_model import DebateModel
-from app.models.moderator_model import ModeratorModel
+from flask import Blueprint, Response, render_template, request, current_app, stream_with_context
+from app.models.debate_history import DebateHistory
+from app.models._http import run_concurrently
 import logging
-import requests  # Add this import
+import orjson
 from functools import wraps
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__)
 
+_UNAVAILABLE_MESSAGE = 'AI service is currently unavailable. Please ensure Ollama is running.'
+_TIMEOUT_MESSAGE = 'The AI service took too long to respond. Please try again.'
+_UNEXPECTED_MESSAGE = 'An unexpected error occurred. Please try again.'
+
+def _error_body(message):
+    """Serialize a static error response body."""
+    return orjson.dumps({'status': 'error', 'message': message})
+
+# Static error bodies are serialized once at import
+_ERR_UNAVAILABLE = _error_body(_UNAVAILABLE_MESSAGE)
+_ERR_TIMEOUT = _error_body(_TIMEOUT_MESSAGE)
+_ERR_UNEXPECTED = _error_body(_UNEXPECTED_MESSAGE)
+_ERR_BAD_BODY = _error_body('Request body must be a JSON object')
+_ERR_NO_TOPIC = _error_body('Please provide a valid debate topic')
+_ERR_TOPIC_REJECTED = _error_body('Topic is not appropriate for debate. Please choose another topic.')
+_ERR_MISSING_ROUND_INFO = _error_body('Missing required debate information')
+_ERR_INVALID_SIDE = _error_body('Invalid debate side specified')
+_ERR_MISSING_SUMMARY_INFO = _error_body('Missing required debate information for summary')
+_ERR_INVALID_HISTORY = _error_body('Debate history entries must be strings or objects with string side and text')
+
+def _error_response(body, status):
+    """Wrap a precomputed error body in a new JSON response."""
+    return Response(body, status=status, mimetype='application/json')
+
+def _json_response(payload, status=200):
+    """Serialize a response payload with orjson."""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+def _json_body():
+    """Parse the request body with orjson, or return None if it is not a JSON object."""
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
 # Error handling decorator
 def handle_errors(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
-        except requests.exceptions.ConnectionError:
+        except ConnectionError:
             logger.error("Failed to connect to Ollama service")
-            return jsonify({
-                'status': 'error',
-                'message': 'AI service is currently unavailable. Please ensure Ollama is running.'
-            }), 503
+            return _error_response(_ERR_UNAVAILABLE, 503)
+        except TimeoutError:
+            logger.error("Ollama service timed out")
+            return _error_response(_ERR_TIMEOUT, 504)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-            return jsonify({
-                'status': 'error',
-                'message': 'An unexpected error occurred. Please try again.'
-            }), 500
+            logger.error("Unexpected error: %s", e, exc_info=True)
+            return _error_response(_ERR_UNEXPECTED, 500)
     return decorated_function
 
-# Initialize models with error handling
+# Model instances are created once in create_app
 def get_models():
-    try:
-        filter_model = FilterModel(current_app.config['FILTER_MODEL'])
-        prompt_model = PromptModel(current_app.config['PROMPT_MODEL'])
-        debate_model_for = DebateModel(current_app.config['DEBATE_MODEL'])
-        debate_model_against = DebateModel(current_app.config['DEBATE_MODEL'])
-        moderator_model = ModeratorModel(current_app.config['MODERATOR_MODEL'])
-        return filter_model, prompt_model, debate_model_for, debate_model_against, moderator_model
-    except Exception as e:
-        logger.error(f"Failed to initialize models: {str(e)}")
-        raise
+    models = current_app.extensions['debate_models']
+    return models.filter, models.prompt, models.debate_for, models.debate_against, models.moderator
 
 @main.route('/')
 def index():
@@ -58,52 +80,183 @@ def start_debate():
     1. Validate and filter the topic
     2. Generate opposing stances
     3. Create system prompts for debaters
+
+    When the filter has to ask the model, stances are generated
+    speculatively alongside it, and only cached once the topic is approved.
     """
-    topic = request.json.get('topic')
-    if not topic or len(topic.strip()) == 0:
-        return jsonify({
-            'status': 'error',
-            'message': 'Please provide a valid debate topic'
-        }), 400
+    data = _json_body()
+    if data is None:
+        return _error_response(_ERR_BAD_BODY, 400)
+
+    topic = data.get('topic')
+    if not isinstance(topic, str) or len(topic.strip()) == 0:
+        return _error_response(_ERR_NO_TOPIC, 400)
 
     # Get model instances
     filter_model, prompt_model, *_ = get_models()
 
     # Step 1: Filter the topic
-    try:
-        filter_result = filter_model.filter_topic(topic)
-        if not filter_result['is_appropriate']:
-            return jsonify({
-                'status': 'error',
-                'message': 'Topic is not appropriate for debate. Please choose another topic.'
-            }), 400
-    except Exception as e:
-        logger.error(f"Topic filtering failed: {str(e)}")
-        raise
+    filter_result = filter_model.known_verdict(topic)
+    stances = None
+    if filter_result is None:
+        # The filter needs the model, so start on the stances meanwhile
+        stances = current_app.extensions['executor'].submit(
+            prompt_model.generate_stances, topic, persist=False
+        )
+        try:
+            filter_result = filter_model.filter_topic(topic)
+        except Exception:
+            stances.cancel()
+            raise
+    if not filter_result['is_appropriate']:
+        if stances is not None:
+            stances.cancel()
+        return _error_response(_ERR_TOPIC_REJECTED, 400)
 
     # Step 2: Generate debate stances
-    try:
+    if stances is None:
         for_stance, against_stance = prompt_model.generate_stances(topic)
-        if not for_stance or not against_stance:
-            raise ValueError("Failed to generate valid debate stances")
-        
-        # Step 3: Generate system prompts
-        for_system_prompt = prompt_model.generate_system_prompt(for_stance, topic)
-        against_system_prompt = prompt_model.generate_system_prompt(against_stance, topic)
-
-        return jsonify({
-            'status': 'success',
-            'data': {
-                'topic': topic,
-                'for_stance': for_stance,
-                'against_stance': against_stance,
-                'for_system_prompt': for_system_prompt,
-                'against_system_prompt': against_system_prompt
-            }
+    else:
+        for_stance, against_stance = stances.result()
+        prompt_model.save_stances(topic, for_stance, against_stance)
+    if not for_stance or not against_stance:
+        raise ValueError("Failed to generate valid debate stances")
+
+    # Step 3: Generate both system prompts in one model call
+    for_system_prompt, against_system_prompt = prompt_model.generate_system_prompts_pair(
+        for_stance, against_stance, topic
+    )
+
+    return _json_response({
+        'status': 'success',
+        'data': {
+            'topic': topic,
+            'for_stance': for_stance,
+            'against_stance': against_stance,
+            'for_system_prompt': for_system_prompt,
+            'against_system_prompt': against_system_prompt
+        }
+    })
+
+def _valid_history(entries):
+    """Check that every history entry is a string or a dict of strings."""
+    for entry in entries:
+        if isinstance(entry, dict):
+            if not isinstance(entry.get('side', ''), str) or not isinstance(entry.get('text', ''), str):
+                return False
+        elif not isinstance(entry, str):
+            return False
+    return True
+
+def _validate_round(data):
+    """Return an error response for an invalid round request, or None."""
+    if data is None:
+        return _error_response(_ERR_BAD_BODY, 400)
+
+    if not isinstance(data.get('topic'), str) or 'current_side' not in data:
+        return _error_response(_ERR_MISSING_ROUND_INFO, 400)
+    debate_history = data.get('debate_history')
+    if debate_history is not None and not isinstance(debate_history, list):
+        return _error_response(_ERR_MISSING_ROUND_INFO, 400)
+    if debate_history and not _valid_history(debate_history):
+        return _error_response(_ERR_INVALID_HISTORY, 400)
+
+    if data.get('current_side') not in ['for', 'against']:
+        return _error_response(_ERR_INVALID_SIDE, 400)
+    return None
+
+def _moderate_previous_turns(moderator_model, topic, history, count):
+    """
+    Start moderating the debater turns the previous round added.
+
+    Each of the last count turns is judged in the background against the
+    history up to that turn. When a verdict calls for an intervention, the
+    summary is started straight away as well and covers the debate up to
+    the flagged turn.
+
+    Args:
+        moderator_model: The moderator to judge the turns with
+        topic (str): The debate topic
+        history (DebateHistory): The history sent with this round
+        count (int): Turns the previous round added (2 for both_sides)
+
+    Returns:
+        List[Tuple[int, Future]]: The history index of each debater turn
+            judged, oldest first, with a future resolving to
+            (verdict, summary)
+    """
+    def moderate(index):
+        turn_history = history.head(index + 1)
+        verdict = moderator_model.moderate_turn(
+            topic=topic,
+            current_argument=history.texts[index],
+            debate_history=turn_history
+        )
+        summary = None
+        if verdict['needs_intervention']:
+            # Get moderator's summary and guidance
+            summary = moderator_model.generate_summary(topic, turn_history)
+        return verdict, summary
+
+    executor = current_app.extensions['executor']
+    return [
+        (index, executor.submit(moderate, index))
+        for index in range(max(len(history) - count, 0), len(history))
+        if history.sides[index] in ('FOR', 'AGAINST')
+    ]
+
+def _round_result(debate_history, new_turns, moderations, next_side, both_sides=False):
+    """
+    Wait for the moderation and build the response data for a round.
+
+    The moderation covers the turns before this round's arguments. On
+    success their verdicts are returned as 'previous_evaluations' with
+    their debate_history indices in 'evaluated_turns'; an intervention
+    reports the earliest flagged turn as 'evaluated_turn'.
+    """
+    results = [(index, future.result()) for index, future in moderations]
+    flagged = next(
+        ((index, verdict, summary) for index, (verdict, summary) in results
+         if verdict['needs_intervention']),
+        None
+    )
+
+    # Add the arguments to debate history
+    if debate_history is None:
+        debate_history = []
+    for side, text in new_turns:
+        debate_history.append({
+            'side': side,
+            'text': text
         })
-    except Exception as e:
-        logger.error(f"Debate initialization failed: {str(e)}")
-        raise
+    current_argument = new_turns[0][1]
+
+    if flagged:
+        evaluated_turn, verdict, summary = flagged
+        result = {
+            'status': 'moderator_intervention',
+            'argument': current_argument,
+            'message': verdict['feedback'],
+            'summary': summary,
+            'evaluated_turn': evaluated_turn,
+            'next_side': next_side
+        }
+    else:
+        result = {
+            'status': 'success',
+            'argument': current_argument,
+            'previous_evaluations': [verdict for _, (verdict, _) in results],
+            'evaluated_turns': [index for index, _ in results],
+            'next_side': next_side,
+            'debate_history': debate_history
+        }
+    if both_sides:
+        result['arguments'] = [{'side': side, 'text': text} for side, text in new_turns]
+    return result
+
+def _sse(event):
+    """Encode one server-sent event carrying a JSON payload."""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
 
 @main.route('/debate_round', methods=['POST'])
 @handle_errors
@@ -114,103 +267,136 @@ def debate_round():
     1. Generate their arguments considering previous points
     2. Have the moderator evaluate and guide the discussion
     3. Build upon each other's points
+
+    Moderation is pipelined: each round evaluates the turns the previous
+    round added while the current turn is generated, so an intervention
+    appears one round later but moderator latency stays off the critical
+    path. The verdicts are returned as 'previous_evaluations', with
+    'evaluated_turns' giving the debate_history index of each turn.
+
+    With 'both_sides': true, both debaters answer the same history
+    concurrently and the response also lists them under 'arguments',
+    current side first. The next both_sides round then judges both of
+    those turns, so keep the flag the same for the whole debate.
     """
-    data = request.json
-    required_fields = ['topic', 'current_side']
-    if not all(field in data for field in required_fields):
-        return jsonify({
-            'status': 'error',
-            'message': 'Missing required debate information'
-        }), 400
+    data = _json_body()
+    error = _validate_round(data)
+    if error:
+        return error
 
     topic = data.get('topic')
     debate_history = data.get('debate_history', [])
     current_side = data.get('current_side')
-
-    if current_side not in ['for', 'against']:
-        return jsonify({
-            'status': 'error',
-            'message': 'Invalid debate side specified'
-        }), 400
+    both_sides = bool(data.get('both_sides'))
 
     # Get model instances
     _, _, debate_model_for, debate_model_against, moderator_model = get_models()
 
-    try:
-        # Generate argument for current side
-        current_model = debate_model_for if current_side == 'for' else debate_model_against
-        response = current_model.generate_response(
-            topic=topic,
-            context=debate_history,
-            stance=current_side
-        )
-        
-        current_argument = response['response']
-        
-        # Add the argument to debate history
-        if debate_history is None:
-            debate_history = []
-        debate_history.append({
-            'side': current_side,
-            'text': current_argument
-        })
+    # Convert the request history once for every prompt built this round
+    history = DebateHistory.from_entries(debate_history)
 
-        # Check if moderator should intervene
-        moderator_check = moderator_model.should_intervene(topic, [h['text'] for h in debate_history])
-        
-        if moderator_check['needs_intervention']:
-            # Get moderator's summary and guidance
-            summary = moderator_model.generate_summary(topic, [h['text'] for h in debate_history])
-            
-            return jsonify({
-                'status': 'moderator_intervention',
-                'argument': current_argument,
-                'message': moderator_check['reason'],
-                'summary': summary,
-                'next_side': 'for' if current_side == 'against' else 'against'
-            })
-        
-        # Evaluate the argument
-        evaluation = moderator_model.evaluate_response(
+    # Moderate the previous round's debater turns in the background
+    moderations = _moderate_previous_turns(moderator_model, topic, history, 2 if both_sides else 1)
+
+    other_side = 'for' if current_side == 'against' else 'against'
+    models = {'for': debate_model_for, 'against': debate_model_against}
+
+    def generate(side):
+        return models[side].generate_response(
             topic=topic,
-            current_argument=current_argument,
-            debate_history=[h['text'] for h in debate_history]
+            context=history,
+            stance=side
+        )['response']
+
+    # Generate argument for current side (and the other side alongside)
+    if both_sides:
+        current_argument, other_argument = run_concurrently(
+            lambda: generate(current_side),
+            lambda: generate(other_side)
         )
-        
-        return jsonify({
-            'status': 'success',
-            'argument': current_argument,
-            'evaluation': evaluation,
-            'next_side': 'for' if current_side == 'against' else 'against',
-            'debate_history': debate_history
-        })
+        new_turns = [(current_side, current_argument), (other_side, other_argument)]
+    else:
+        current_argument = generate(current_side)
+        new_turns = [(current_side, current_argument)]
+
+    next_side = current_side if both_sides else other_side
+    return _json_response(_round_result(debate_history, new_turns, moderations, next_side, both_sides))
+
+@main.route('/debate_round/stream', methods=['POST'])
+@handle_errors
+def debate_round_stream():
+    """
+    Handle a single debate round like /debate_round, streaming the argument.
+
+    The response is a server-sent event stream: one {'token': ...} event
+    per piece of the current side's argument as it is generated, then a
+    final {'event': 'done', ...} event with the usual round response, or
+    {'event': 'error', 'message': ...} if the round fails part-way.
+    """
+    data = _json_body()
+    error = _validate_round(data)
+    if error:
+        return error
 
-    except Exception as e:
-        logger.error(f"Debate round generation failed: {str(e)}")
-        raise
+    topic = data.get('topic')
+    debate_history = data.get('debate_history', [])
+    current_side = data.get('current_side')
+
+    # Get model instances
+    _, _, debate_model_for, debate_model_against, moderator_model = get_models()
+    current_model = debate_model_for if current_side == 'for' else debate_model_against
+
+    history = DebateHistory.from_entries(debate_history)
+    moderations = _moderate_previous_turns(moderator_model, topic, history, 1)
+
+    def events():
+        try:
+            pieces = []
+            for piece in current_model.stream_response(topic=topic, context=history, stance=current_side):
+                pieces.append(piece)
+                yield _sse({'token': piece})
+
+            next_side = 'for' if current_side == 'against' else 'against'
+            result = _round_result(debate_history, [(current_side, "".join(pieces))], moderations, next_side)
+            yield _sse(dict(result, event='done'))
+        # Headers are already sent, so failures are reported in-stream
+        except ConnectionError:
+            logger.error("Failed to connect to Ollama service")
+            yield _sse({'event': 'error', 'message': _UNAVAILABLE_MESSAGE})
+        except TimeoutError:
+            logger.error("Ollama service timed out")
+            yield _sse({'event': 'error', 'message': _TIMEOUT_MESSAGE})
+        except Exception as e:
+            logger.error("Streamed debate round failed: %s", e, exc_info=True)
+            yield _sse({'event': 'error', 'message': _UNEXPECTED_MESSAGE})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @main.route('/end_debate', methods=['POST'])
 @handle_errors
 def end_debate():
     """Generate final debate summary and conclude the session"""
-    data = request.json
-    if 'topic' not in data or 'debate_history' not in data:
-        return jsonify({
-            'status': 'error',
-            'message': 'Missing required debate information for summary'
-        }), 400
+    data = _json_body()
+    if data is None:
+        return _error_response(_ERR_BAD_BODY, 400)
 
-    try:
-        _, _, _, _, moderator_model = get_models()
-        final_summary = moderator_model.generate_summary(
-            data['topic'], 
-            data['debate_history']
-        )
-        
-        return jsonify({
-            'status': 'success',
-            'final_summary': final_summary
-        })
-    except Exception as e:
-        logger.error(f"Debate conclusion failed: {str(e)}")
-        raise
+    debate_history = data.get('debate_history')
+    if not isinstance(data.get('topic'), str) or not isinstance(debate_history, list) or not debate_history:
+        return _error_response(_ERR_MISSING_SUMMARY_INFO, 400)
+    if not _valid_history(debate_history):
+        return _error_response(_ERR_INVALID_HISTORY, 400)
+
+    _, _, _, _, moderator_model = get_models()
+    final_summary = moderator_model.generate_summary(
+        data['topic'], 
+        debate_history
+    )
+    
+    return _json_response({
+        'status': 'success',
+        'final_summary': final_summary
+    })
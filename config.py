@@ -1,9 +1,17 @@
+import os
+
 class Config:
     # Flask configuration
-    SECRET_KEY = 'your-secret-key-here'  # Change this in production
+    SECRET_KEY = os.getenv("SECRET_KEY", 'your-secret-key-here')  # Set this in production
     
     # Ollama model configurations
-    FILTER_MODEL = "llama3.2:3b"  # For filtering inappropriate content
-    PROMPT_MODEL = "llama3.2:3b"  # For creating debate prompts
-    DEBATE_MODEL = "llama3.2:3b"  # Main debate model
-    MODERATOR_MODEL = "llama3.2:3b"  # For moderation
+    FILTER_MODEL = os.getenv("FILTER_MODEL", "llama3.2:3b")  # For filtering inappropriate content
+    PROMPT_MODEL = os.getenv("PROMPT_MODEL", "llama3.2:3b")  # For creating debate prompts
+    DEBATE_MODEL = os.getenv("DEBATE_MODEL", "llama3.2:3b")  # Main debate model
+    MODERATOR_MODEL = os.getenv("MODERATOR_MODEL", "llama3.2:3b")  # For moderation
+
+    # Load each model into Ollama at startup so the first debate doesn't wait
+    PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() != "false"
+
+    # Generations Ollama runs at once; match the server's OLLAMA_NUM_PARALLEL
+    OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
@@ -3,4 +3,6 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # The reloader imports this module again in a child process, which
+    # would build the app and send every preload a second time
+    app.run(debug=True, use_reloader=not app.config['PRELOAD_MODELS'])
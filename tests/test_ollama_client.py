@@ -0,0 +1,176 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import json
+import threading
+import unittest
+
+from app.models._ollama_client import CircuitBreaker, OllamaClient
+
+
+class _Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch("app.models._ollama_client.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+    def test_stays_closed_below_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_open_half_open_closed_cycle(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        # Half-open once the cool-down is over; the trial succeeds
+        self.clock.now += 30.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_admits_a_single_trial(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 30.0
+
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_failed_trial_starts_another_cool_down(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now += 30.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.clock.now += 29.0
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 1.0
+        self.assertTrue(self.breaker.allow())
+
+
+class _ErrorHandler(BaseHTTPRequestHandler):
+    """Answers every generate request with the server's configured status."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests += 1
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ErrorHandler)
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        patcher = mock.patch("app.models._ollama_client.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        host, port = self.server.server_address
+        self.client = OllamaClient(timeout=5, base_url=f"http://{host}:{port}")
+        self.client.breaker = CircuitBreaker(failure_threshold=3)
+
+    def test_server_error_is_retried_and_counted_once(self):
+        self.server.status = 500
+        with self.assertRaises(ConnectionError):
+            self.client.generate("model", "prompt")
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.client.breaker.fail_count, 1)
+
+    def test_repeated_server_errors_open_the_breaker(self):
+        self.server.status = 503
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                self.client.generate("model", "prompt")
+        self.assertFalse(self.client.breaker.allow())
+
+    def test_client_error_is_not_retried_or_counted(self):
+        self.server.status = 404
+        self.client.breaker.record_failure()
+        with self.assertRaises(ValueError):
+            self.client.generate("model", "prompt")
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(self.client.breaker.fail_count, 0)
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    """Streams a short NDJSON generate reply."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = [{"response": word, "done": False} for word in ("one ", "two ", "three")]
+        chunks.append({"response": "", "done": True})
+        for chunk in chunks:
+            line = json.dumps(chunk).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class GenerateStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StreamHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host, port = self.server.server_address
+        self.client = OllamaClient(timeout=5, base_url=f"http://{host}:{port}", max_parallel=1)
+        self.client.breaker = CircuitBreaker()
+
+    def test_yields_the_reply_pieces(self):
+        self.assertEqual(list(self.client.generate_stream("model", "prompt")), ["one ", "two ", "three"])
+
+    def test_slow_consumer_does_not_hold_the_slot(self):
+        stream = self.client.generate_stream("model", "prompt")
+        self.assertEqual(next(stream), "one ")
+        # The rest of the reply is buffered, so the only slot comes back
+        # while the consumer is still part-way through
+        self.assertTrue(self.client._slots.acquire(timeout=5))
+        self.client._slots.release()
+        self.assertEqual(list(stream), ["two ", "three"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from app.models.prompt_model import PromptModel
+
+
+class ParseStancesTest(unittest.TestCase):
+    def test_well_formed_response(self):
+        result = "FOR: Cats are better pets\nAGAINST: Dogs are better pets"
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+    def test_preamble_starting_with_for_is_ignored(self):
+        result = (
+            "For this topic, here are the stances:\n"
+            "FOR: Cats are better pets\n"
+            "AGAINST: Dogs are better pets"
+        )
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+    def test_last_line_for_each_side_wins(self):
+        result = (
+            "FOR: (write a stance)\nAGAINST: (write a stance)\n\n"
+            "FOR: Cats are better pets\nAGAINST: Dogs are better pets"
+        )
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+    def test_lowercase_labels(self):
+        result = "for: Cats are better pets\nagainst: Dogs are better pets"
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+    def test_labels_without_colons_fall_back_to_line_parsing(self):
+        result = "FOR Cats are better pets\nAGAINST Dogs are better pets"
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+    def test_unlabelled_lines_are_taken_in_order(self):
+        result = "Cats are better pets\nDogs are better pets"
+        self.assertEqual(
+            PromptModel._parse_stances(result),
+            ("Cats are better pets", "Dogs are better pets")
+        )
+
+
+class CacheKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.model = PromptModel("model")
+
+    def test_parts_containing_separators_stay_distinct(self):
+        self.assertNotEqual(
+            self.model._cache_key("system_prompt", "a|b", "c"),
+            self.model._cache_key("system_prompt", "a", "b|c")
+        )
+
+    def test_same_inputs_give_the_same_key(self):
+        self.assertEqual(
+            self.model._cache_key("stances", "Cats or dogs"),
+            self.model._cache_key("stances", "Cats or dogs")
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()